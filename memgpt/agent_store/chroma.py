@@ -1,19 +1,62 @@
 import uuid
-from typing import Optional, List, Iterator, Dict, Tuple, cast
-
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from operator import attrgetter
+from urllib.parse import urlsplit
+from typing import Optional, List, Iterable, Iterator, Dict, Tuple, cast
+
+import numpy as np
 import chromadb
-from chromadb.api.types import Include, GetResult
+from tqdm import tqdm
+from chromadb.api.types import Include
 
 from memgpt.agent_store.storage import StorageConnector, TableType
-from memgpt.utils import printd, datetime_to_timestamp, timestamp_to_datetime
+from memgpt.utils import printd, datetime_to_timestamp
 from memgpt.config import MemGPTConfig
-from memgpt.data_types import Record, Message, Passage, RecordType
+from memgpt.data_types import Record, Passage, RecordType
+
+# record attributes stored as chroma ids/documents/embeddings (or merged separately), not as metadata
+NON_METADATA_FIELDS = frozenset(["id", "text", "embedding", "metadata_"])
+
+# (id, text, embedding) of a record in a single C-level lookup
+get_record_fields = attrgetter("id", "text", "embedding")
+
+# number of records written per chroma upsert call in insert_many
+INSERT_BATCH_SIZE = 200
+
+# max number of concurrent upsert requests in insert_many (HTTP client only)
+INSERT_MAX_CONCURRENCY = 8
+
+
+def parse_chroma_uri(uri: str) -> Tuple[str, int, bool]:
+    """Parse a chroma server uri ({ip}:{port}, optionally with a http(s):// scheme) into (host, port, ssl)"""
+    url = urlsplit(uri if "://" in uri else f"//{uri}")
+    ssl = url.scheme == "https"
+    host = url.hostname
+    # chroma builds its server url as {host}:{port}, so ipv6 hosts need their brackets back
+    if host and ":" in host:
+        host = f"[{host}]"
+    return host, url.port or (443 if ssl else 8000), ssl
+
+
+# metadata fields of each record class, resolved once from the first record of that class seen
+# (records are plain classes rather than dataclasses, so the fields come from the instance attributes)
+METADATA_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def get_metadata_fields(record: Record) -> Tuple[str, ...]:
+    record_type = type(record)
+    if record_type not in METADATA_FIELDS:
+        METADATA_FIELDS[record_type] = tuple(key for key in vars(record) if key not in NON_METADATA_FIELDS)
+    return METADATA_FIELDS[record_type]
 
 
 class ChromaStorageConnector(StorageConnector):
     """Storage via Chroma"""
 
     # WARNING: This is not thread safe. Do NOT do concurrent access to the same collection.
+    # (insert_many's concurrent HTTP upserts don't share a client: each worker thread uses its own, see get_insert_collections)
     # Timestamps are converted to integer timestamps for chroma (datetime not supported)
 
     def __init__(self, table_type: str, config: MemGPTConfig, user_id, agent_id=None):
@@ -24,11 +67,15 @@ class ChromaStorageConnector(StorageConnector):
         # create chroma client
         if config.archival_storage_path:
             self.client = chromadb.PersistentClient(config.archival_storage_path)
+            self.remote = False
         else:
-            # assume uri={ip}:{port}
-            ip = config.archival_storage_uri.split(":")[0]
-            port = config.archival_storage_uri.split(":")[1]
-            self.client = chromadb.HttpClient(host=ip, port=port)
+            host, port, ssl = parse_chroma_uri(config.archival_storage_uri)
+            self.http_client_args = dict(host=host, port=port, ssl=ssl)
+            self.client = chromadb.HttpClient(**self.http_client_args)
+            self.remote = True
+
+        # per-worker collections for concurrent inserts over HTTP (created on first use)
+        self.insert_collections = []
 
         # get a collection or create if it doesn't exist already
         self.collection = self.client.get_or_create_collection(self.table_name)
@@ -37,148 +84,194 @@ class ChromaStorageConnector(StorageConnector):
         # need to be converted to strings
         self.uuid_fields = ["id", "user_id", "agent_id", "source_id", "doc_id"]
 
-    def get_filters(self, filters: Optional[Dict] = {}) -> Tuple[list, dict]:
-        # get all filters for query
-        if filters is not None:
-            filter_conditions = {**self.filters, **filters}
+        # base filters are fixed for the connector, so convert them to chroma format once
+        self.base_filter_conditions = {key: self.filter_condition(key, value) for key, value in self.filters.items()}
+        self.base_filters = self.combine_filter_conditions(list(self.base_filter_conditions.values()))
+
+    def filter_condition(self, key: str, value) -> dict:
+        # convert a single filter to chroma format
+        if key in self.uuid_fields:
+            return {key: {"$eq": str(value)}}
+        return {key: {"$eq": value}}
+
+    def combine_filter_conditions(self, conditions: List[dict]) -> dict:
+        # chroma rejects an empty or single-clause $and
+        if len(conditions) > 1:
+            return {"$and": conditions}
+        elif len(conditions) == 0:
+            return {}
         else:
-            filter_conditions = self.filters
+            return conditions[0]
+
+    def get_filters(self, filters: Optional[Dict] = None) -> Tuple[list, dict]:
+        # get all filters for query (None and {} both mean "base filters only")
+        if not filters:
+            return [], self.base_filters
 
-        # convert to chroma format
-        chroma_filters = []
+        # convert to chroma format (per-call filters override base filters on the same key)
+        filter_conditions = dict(self.base_filter_conditions)
         ids = []
-        for key, value in filter_conditions.items():
+        for key, value in filters.items():
             # filter by id
             if key == "id":
                 ids = [str(value)]
                 continue
+            filter_conditions[key] = self.filter_condition(key, value)
+        return ids, self.combine_filter_conditions(list(filter_conditions.values()))
 
-            # filter by other keys
-            if key in self.uuid_fields:
-                chroma_filters.append({key: {"$eq": str(value)}})
-            else:
-                chroma_filters.append({key: {"$eq": value}})
-
-        if len(chroma_filters) > 1:
-            chroma_filters = {"$and": chroma_filters}
-        elif len(chroma_filters) == 0:
-            chroma_filters = {}
-        else:
-            chroma_filters = chroma_filters[0]
-        return ids, chroma_filters
+    def get_include(self, include_embeddings: bool = True) -> Include:
+        # embeddings are by far the largest part of a result, so callers that don't need them can skip fetching them
+        return self.include if include_embeddings else ["documents", "metadatas"]
 
-    def get_all_paginated(self, filters: Optional[Dict] = {}, page_size: int = 1000, offset: int = 0) -> Iterator[List[RecordType]]:
+    def get_all_paginated(
+        self, filters: Optional[Dict] = None, page_size: int = 1000, offset: int = 0, include_embeddings: bool = True
+    ) -> Iterator[List[RecordType]]:
         ids, filters = self.get_filters(filters)
+        include = self.get_include(include_embeddings)
+        # fetch one bounded page per request, so callers that only take the first page (e.g. the server's paged
+        # endpoints) don't pay for a full scan, and memory stays at O(page_size)
+        # NOTE: chroma can't range-filter or order on ids (so no keyset cursor is possible), and it skips `offset`
+        # rows for each page, so iterating a whole collection of n records skips O(n^2 / page_size) rows in total
         while True:
-            # Retrieve a chunk of records with the given page_size
-            results = self.collection.get(ids=ids, offset=offset, limit=page_size, include=self.include, where=filters)
-
-            # If the chunk is empty, we've retrieved all records
-            assert results["embeddings"] is not None, f"results['embeddings'] was None"
-            if len(results["embeddings"]) == 0:
+            results = self.collection.get(ids=ids, offset=offset, limit=page_size, include=include, where=filters)
+            if not results["ids"]:
                 break
 
             # Yield a list of Record objects converted from the chunk
             yield self.results_to_records(results)
 
-            # Increment the offset to get the next chunk in the next iteration
+            # a short page is the last one
+            if len(results["ids"]) < page_size:
+                break
             offset += page_size
 
+    def metadata_to_fields(self, metadata: dict) -> dict:
+        # convert chroma metadata back to record fields (in place)
+        if "created_at" in metadata:
+            # same conversion as utils.timestamp_to_datetime, without the extra call per record
+            metadata["created_at"] = datetime.fromtimestamp(metadata["created_at"])
+        for key in self.uuid_fields:
+            if key in metadata:
+                metadata[key] = uuid.UUID(metadata[key])
+        return metadata
+
+    def embeddings_to_array(self, embeddings) -> Iterable[Optional[np.ndarray]]:
+        # embeddings may not be returned, depending on table type
+        # (convert the whole batch to an array at once, instead of per record in the record constructor)
+        return np.asarray(embeddings) if embeddings else repeat(None)
+
+    def result_to_record(self, text: str, record_id: str, embedding: Optional[np.ndarray], metadata: dict) -> RecordType:
+        return cast(RecordType, self.type(text=text, embedding=embedding, id=uuid.UUID(record_id), **self.metadata_to_fields(metadata)))  # type: ignore
+
     def results_to_records(self, results) -> List[RecordType]:
-        # convert timestamps to datetime
-        for metadata in results["metadatas"]:
-            if "created_at" in metadata:
-                metadata["created_at"] = timestamp_to_datetime(metadata["created_at"])
-            for key, value in metadata.items():
-                if key in self.uuid_fields:
-                    metadata[key] = uuid.UUID(value)
-        if results["embeddings"]:  # may not be returned, depending on table type
-            return [
-                cast(RecordType, self.type(text=text, embedding=embedding, id=uuid.UUID(record_id), **metadatas))  # type: ignore
-                for (text, record_id, embedding, metadatas) in zip(
-                    results["documents"], results["ids"], results["embeddings"], results["metadatas"]
-                )
-            ]
-        else:
-            # no embeddings
-            return [
-                cast(RecordType, self.type(text=text, id=uuid.UUID(id), **metadatas))  # type: ignore
-                for (text, id, metadatas) in zip(results["documents"], results["ids"], results["metadatas"])
-            ]
+        if not results["ids"]:
+            return []
+        embeddings = self.embeddings_to_array(results["embeddings"])
+        return [
+            self.result_to_record(text, record_id, embedding, metadata)
+            for (text, record_id, embedding, metadata) in zip(results["documents"], results["ids"], embeddings, results["metadatas"])
+        ]
 
-    def get_all(self, filters: Optional[Dict] = {}, limit=None) -> List[RecordType]:
+    def get_all(self, filters: Optional[Dict] = None, limit=None, include_embeddings: bool = True) -> List[RecordType]:
         ids, filters = self.get_filters(filters)
         if self.collection.count() == 0:
             return []
+        include = self.get_include(include_embeddings)
         if limit:
-            results = self.collection.get(ids=ids, include=self.include, where=filters, limit=limit)
+            results = self.collection.get(ids=ids, include=include, where=filters, limit=limit)
         else:
-            results = self.collection.get(ids=ids, include=self.include, where=filters)
+            results = self.collection.get(ids=ids, include=include, where=filters)
         return self.results_to_records(results)
 
     def get(self, id: uuid.UUID) -> Optional[RecordType]:
-        results = self.collection.get(ids=[str(id)])
-        if len(results["ids"]) == 0:
+        # single record lookup, so build the one record directly (same conversion as results_to_records)
+        results = self.collection.get(ids=[str(id)], include=self.include)
+        if not results["ids"]:
             return None
-        return self.results_to_records(results)[0]
+        embedding = next(iter(self.embeddings_to_array(results["embeddings"])))
+        return self.result_to_record(results["documents"][0], results["ids"][0], embedding, results["metadatas"][0])
 
     def format_records(self, records: List[RecordType]):
         assert all([isinstance(r, Passage) for r in records])
 
-        recs = []
-        ids = []
-        documents = []
-        embeddings = []
-
         # de-duplication of ids
         exist_ids = set()
-        for i in range(len(records)):
-            record = records[i]
+        recs = []
+        for record in records:
             if record.id in exist_ids:
                 continue
             exist_ids.add(record.id)
             recs.append(cast(Passage, record))
-            ids.append(str(record.id))
-            documents.append(record.text)
-            embeddings.append(record.embedding)
-
-        # collect/format record metadata
-        metadatas = []
-        for record in recs:
-            metadata = vars(record)
-            metadata.pop("id")
-            metadata.pop("text")
-            metadata.pop("embedding")
+
+        n = len(recs)
+        ids: List = [None] * n
+        documents: List = [None] * n
+        embeddings: List = [None] * n
+        metadatas: List = [None] * n
+        for i, record in enumerate(recs):
+            record_id, documents[i], embeddings[i] = get_record_fields(record)
+            if embeddings[i] is None:
+                raise ValueError("Embeddings must be provided to chroma")
+            ids[i] = str(record_id)
+
+            # collect/format record metadata (null values not allowed)
+            metadata = {key: value for key in get_metadata_fields(record) if (value := getattr(record, key, None)) is not None}
             if "created_at" in metadata:
                 metadata["created_at"] = datetime_to_timestamp(metadata["created_at"])
-            if "metadata_" in metadata and metadata["metadata_"] is not None:
-                record_metadata = dict(metadata["metadata_"])
-                metadata.pop("metadata_")
-            else:
-                record_metadata = {}
-            metadata = {key: value for key, value in metadata.items() if value is not None}  # null values not allowed
-            metadata = {**metadata, **record_metadata}  # merge with metadata
+            if record.metadata_:
+                metadata.update(record.metadata_)  # merge with metadata
 
             # convert uuids to strings
-            for key, value in metadata.items():
-                if key in self.uuid_fields:
-                    metadata[key] = str(value)
-            metadatas.append(metadata)
+            for key in self.uuid_fields:
+                if key in metadata:
+                    metadata[key] = str(metadata[key])
+            metadatas[i] = metadata
         return ids, documents, embeddings, metadatas
 
     def insert(self, record: Record):
         ids, documents, embeddings, metadatas = self.format_records([record])
-        if any([e is None for e in embeddings]):
-            raise ValueError("Embeddings must be provided to chroma")
-        self.collection.upsert(documents=documents, embeddings=[e for e in embeddings if e is not None], ids=ids, metadatas=metadatas)
+        self.collection.upsert(documents=documents, embeddings=embeddings, ids=ids, metadatas=metadatas)
 
     def insert_many(self, records: List[RecordType], show_progress=False):
         ids, documents, embeddings, metadatas = self.format_records(records)
-        if any([e is None for e in embeddings]):
-            raise ValueError("Embeddings must be provided to chroma")
-        self.collection.upsert(documents=documents, embeddings=[e for e in embeddings if e is not None], ids=ids, metadatas=metadatas)
 
-    def delete(self, filters: Optional[Dict] = {}):
+        # upsert in sub-batches: keeps each chroma write transaction small (and under the client's max batch size)
+        def upsert_batch(collection, start: int):
+            end = start + INSERT_BATCH_SIZE
+            collection.upsert(
+                documents=documents[start:end], embeddings=embeddings[start:end], ids=ids[start:end], metadatas=metadatas[start:end]
+            )
+
+        starts = range(0, len(ids), INSERT_BATCH_SIZE)
+        if self.remote and len(starts) > 1:
+            # over HTTP the network round-trip dominates, so overlap requests (ids are de-duplicated, so batches are independent)
+            # each worker upserts every n-th batch through its own client
+            collections = self.get_insert_collections(min(INSERT_MAX_CONCURRENCY, len(starts)))
+            progress = tqdm(total=len(starts), disable=not show_progress)
+
+            def upsert_batches(collection, worker_starts: range):
+                for start in worker_starts:
+                    upsert_batch(collection, start)
+                    progress.update()
+
+            with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+                worker_starts = [starts[i :: len(collections)] for i in range(len(collections))]
+                list(executor.map(upsert_batches, collections, worker_starts))  # consume to surface errors
+            progress.close()
+        else:
+            iterable = tqdm(starts) if show_progress else starts
+            for start in iterable:
+                upsert_batch(self.collection, start)
+
+    def get_insert_collections(self, count: int) -> list:
+        # a chroma HTTP client (and the requests session behind it) isn't safe to share between threads, so each
+        # concurrent insert worker gets its own client (every chromadb.HttpClient creates its own system and session)
+        while len(self.insert_collections) < count:
+            client = chromadb.HttpClient(**self.http_client_args)
+            self.insert_collections.append(client.get_or_create_collection(self.table_name))
+        return self.insert_collections[:count]
+
+    def delete(self, filters: Optional[Dict] = None):
         ids, filters = self.get_filters(filters)
         self.collection.delete(ids=ids, where=filters)
 
@@ -190,17 +283,24 @@ class ChromaStorageConnector(StorageConnector):
         # save to persistence file (nothing needs to be done)
         printd("Saving chroma")
 
-    def size(self, filters: Optional[Dict] = {}) -> int:
-        # unfortuantely, need to use pagination to get filtering
-        # warning: poor performance for large datasets
-        return len(self.get_all(filters=filters))
+    def size(self, filters: Optional[Dict] = None) -> int:
+        ids, filters = self.get_filters(filters)
+        if not ids and not filters:
+            return self.collection.count()
+
+        # chroma has no filtered count, so fetch only the matching ids (ids are always returned) in a single get
+        return len(self.collection.get(ids=ids, include=[], where=filters)["ids"])
 
     def list_data_sources(self):
         raise NotImplementedError
 
-    def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}) -> List[RecordType]:
+    def query(
+        self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = None, include_embeddings: bool = True
+    ) -> List[RecordType]:
         ids, filters = self.get_filters(filters)
-        results = self.collection.query(query_embeddings=[query_vec], n_results=top_k, include=self.include, where=filters)
+        results = self.collection.query(
+            query_embeddings=[query_vec], n_results=top_k, include=self.get_include(include_embeddings), where=filters
+        )
 
         # flatten, since we only have one query vector
         flattened_results = {}
@@ -227,7 +327,7 @@ class ChromaStorageConnector(StorageConnector):
         # results = results[start : start + count]
         # return self.results_to_records(results)
 
-    def query_text(self, query, count=None, start=None, filters: Optional[Dict] = {}):
+    def query_text(self, query, count=None, start=None, filters: Optional[Dict] = None):
         raise ValueError("Cannot run query_text with chroma")
         # filters = self.get_filters(filters)
         # results = self.collection.query(where_document={"$contains": {"text": query}}, where=filters)
@@ -238,7 +338,7 @@ class ChromaStorageConnector(StorageConnector):
 
     def get_all_cursor(
         self,
-        filters: Optional[Dict] = {},
+        filters: Optional[Dict] = None,
         after: uuid.UUID = None,
         before: uuid.UUID = None,
         limit: Optional[int] = 1000,
@@ -260,7 +260,10 @@ class SQLStorageConnector(StorageConnector):
         all_filters = [getattr(self.db_model, key) == value for key, value in filter_conditions.items()]
         return all_filters
 
-    def get_all_paginated(self, filters: Optional[Dict] = {}, page_size: Optional[int] = 1000, offset=0) -> Iterator[List[RecordType]]:
+    def get_all_paginated(
+        self, filters: Optional[Dict] = {}, page_size: Optional[int] = 1000, offset=0, include_embeddings: bool = True
+    ) -> Iterator[List[RecordType]]:
+        # NOTE: include_embeddings is ignored, the embedding column is always loaded
         filters = self.get_filters(filters)
         while True:
             # Retrieve a chunk of records with the given page_size
@@ -329,7 +332,8 @@ class SQLStorageConnector(StorageConnector):
         # return (cursor, list[records])
         return (next_cursor, records)
 
-    def get_all(self, filters: Optional[Dict] = {}, limit=None) -> List[RecordType]:
+    def get_all(self, filters: Optional[Dict] = {}, limit=None, include_embeddings: bool = True) -> List[RecordType]:
+        # NOTE: include_embeddings is ignored, the embedding column is always loaded
         filters = self.get_filters(filters)
         with self.session_maker() as session:
             if limit:
@@ -357,7 +361,9 @@ class SQLStorageConnector(StorageConnector):
     def insert_many(self, records: List[RecordType], show_progress=False):
         raise NotImplementedError
 
-    def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}) -> List[RecordType]:
+    def query(
+        self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}, include_embeddings: bool = True
+    ) -> List[RecordType]:
         raise NotImplementedError("Vector query not implemented for SQLStorageConnector")
 
     def save(self):
@@ -465,7 +471,10 @@ class PostgresStorageConnector(SQLStorageConnector):
         # create table
         Base.metadata.create_all(self.engine, tables=[self.db_model.__table__])  # Create the table if it doesn't exist
 
-    def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}) -> List[RecordType]:
+    def query(
+        self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}, include_embeddings: bool = True
+    ) -> List[RecordType]:
+        # NOTE: include_embeddings is ignored, the embedding column is always loaded
         filters = self.get_filters(filters)
         with self.session_maker() as session:
             results = session.scalars(
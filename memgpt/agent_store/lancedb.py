@@ -124,12 +124,14 @@ class LanceDBConnector(StorageConnector):
         return where_filters.join(" AND ")
 
     @abstractmethod
-    def get_all_paginated(self, filters: Optional[Dict] = {}, page_size: Optional[int] = 1000) -> Iterator[List[Record]]:
+    def get_all_paginated(
+        self, filters: Optional[Dict] = {}, page_size: Optional[int] = 1000, offset: int = 0, include_embeddings: bool = True
+    ) -> Iterator[List[Record]]:
         # TODO
         pass
 
     @abstractmethod
-    def get_all(self, filters: Optional[Dict] = {}, limit=10) -> List[Record]:
+    def get_all(self, filters: Optional[Dict] = {}, limit=10, include_embeddings: bool = True) -> List[Record]:
         # TODO
         pass
 
@@ -154,7 +156,9 @@ class LanceDBConnector(StorageConnector):
         pass
 
     @abstractmethod
-    def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}) -> List[Record]:
+    def query(
+        self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}, include_embeddings: bool = True
+    ) -> List[Record]:
         # TODO
         pass
 
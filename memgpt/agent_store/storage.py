@@ -132,12 +132,21 @@ class StorageConnector:
     def get_filters(self, filters: Optional[Dict] = {}) -> Union[Tuple[list, dict], dict]:
         pass
 
+    # NOTE: include_embeddings=False lets callers that discard the vectors skip fetching them
+    # (connectors that can't skip them return records with embeddings anyway)
     @abstractmethod
-    def get_all_paginated(self, filters: Optional[Dict] = {}, page_size: int = 1000) -> Iterator[List[RecordType]]:
+    def get_all_paginated(
+        self, filters: Optional[Dict] = {}, page_size: int = 1000, offset: int = 0, include_embeddings: bool = True
+    ) -> Iterator[List[RecordType]]:
         pass
 
+    def iter_all(self, filters: Optional[Dict] = None, page_size: int = 1000, include_embeddings: bool = True) -> Iterator[RecordType]:
+        """Iterate over records one at a time, fetching them from storage a page at a time"""
+        for page in self.get_all_paginated(filters=filters, page_size=page_size, include_embeddings=include_embeddings):
+            yield from page
+
     @abstractmethod
-    def get_all(self, filters: Optional[Dict] = {}, limit=10) -> List[RecordType]:
+    def get_all(self, filters: Optional[Dict] = {}, limit=10, include_embeddings: bool = True) -> List[RecordType]:
         pass
 
     @abstractmethod
@@ -157,7 +166,9 @@ class StorageConnector:
         pass
 
     @abstractmethod
-    def query(self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}) -> List[RecordType]:
+    def query(
+        self, query: str, query_vec: List[float], top_k: int = 10, filters: Optional[Dict] = {}, include_embeddings: bool = True
+    ) -> List[RecordType]:
         pass
 
     @abstractmethod
@@ -447,7 +447,8 @@ class EmbeddingArchivalMemory(ArchivalMemory):
             if query_string not in self.cache:
                 # self.cache[query_string] = self.retriever.retrieve(query_string)
                 query_vec = query_embedding(self.embed_model, query_string)
-                self.cache[query_string] = self.storage.query(query_string, query_vec, top_k=self.top_k)
+                # only the text of the results is used, so don't fetch their embeddings
+                self.cache[query_string] = self.storage.query(query_string, query_vec, top_k=self.top_k, include_embeddings=False)
 
             start = int(start if start else 0)
             count = int(count if count else self.top_k)
@@ -463,7 +464,7 @@ class EmbeddingArchivalMemory(ArchivalMemory):
     def __repr__(self) -> str:
         limit = 10
         passages = []
-        for passage in list(self.storage.get_all(limit=limit)):  # TODO: only get first 10
+        for passage in list(self.storage.get_all(limit=limit, include_embeddings=False)):  # TODO: only get first 10
             passages.append(str(passage.text))
         memory_str = "\n".join(passages)
         return f"\n### ARCHIVAL MEMORY ###" + f"\n{memory_str}" + f"\nSize: {self.storage.size()}"
@@ -1022,7 +1022,7 @@ class SyncServer(LockingServer):
         memgpt_agent = self._get_or_load_agent(user_id=user_id, agent_id=agent_id)
 
         # Assume passages
-        records = memgpt_agent.persistence_manager.archival_memory.storage.get_all()
+        records = memgpt_agent.persistence_manager.archival_memory.storage.get_all(include_embeddings=False)
         print("records:", records)
 
         return [dict(id=str(r.id), contents=r.text) for r in records]
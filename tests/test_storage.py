@@ -1,7 +1,9 @@
 import os
+import copy
 from sqlalchemy.ext.declarative import declarative_base
 import uuid
 import pytest
+import numpy as np
 
 from memgpt.agent_store.storage import StorageConnector, TableType
 from memgpt.embeddings import embedding_model, query_embedding
@@ -228,6 +230,12 @@ def test_storage(
         conn.size() == 2
     ), f"Expected 1 record, got {conn.size()}: {conn.get_all()}"  # expect 2, since storage connector filters for agent1
 
+    # test: inserting doesn't modify the records
+    for record, id, text in zip(records, ids, texts):
+        assert record.id == id, f"Expected id {id}, got {record.id}"
+        assert record.text == text, f"Expected text {text}, got {record.text}"
+        assert record.embedding is not None, f"Record {record.id} lost its embedding"
+
     # test: update
     # NOTE: only testing with messages
     if table_type == TableType.RECALL_MEMORY:
@@ -258,11 +266,20 @@ def test_storage(
         paginated_total += len(page)
     assert paginated_total == 2, f"Expected 2 records, got {paginated_total}"
 
+    # test: iter_all
+    iterated_records = list(conn.iter_all(page_size=1))
+    assert len(iterated_records) == 2, f"Expected 2 records, got {len(iterated_records)}"
+    assert len({record.id for record in iterated_records}) == 2, f"Expected 2 distinct records, got {iterated_records}"
+    iterated_records = list(conn.iter_all(page_size=1, include_embeddings=False))
+    assert len(iterated_records) == 2, f"Expected 2 records, got {len(iterated_records)}"
+
     # test: get_all
     all_records = conn.get_all()
     assert len(all_records) == 2, f"Expected 2 records, got {len(all_records)}"
     all_records = conn.get_all(limit=1)
     assert len(all_records) == 1, f"Expected 1 records, got {len(all_records)}"
+    all_records = conn.get_all(include_embeddings=False)
+    assert len(all_records) == 2, f"Expected 2 records, got {len(all_records)}"
 
     # test: get
     print("GET ID", ids[0], records)
@@ -307,3 +324,107 @@ def test_storage(
 
     # cleanup
     ms.delete_user(user_id)
+
+
+@pytest.mark.parametrize("chroma_client", ["persistent", "http"])
+def test_chroma_insert_many_batches(chroma_client):
+    """Insert more records than fit in a single chroma upsert batch"""
+    from memgpt.agent_store.chroma import ChromaStorageConnector, INSERT_BATCH_SIZE, INSERT_MAX_CONCURRENCY
+
+    config = copy.copy(TEST_MEMGPT_CONFIG)
+    config.archival_storage_type = "chroma"
+    if chroma_client == "persistent":
+        config.archival_storage_path = "./test_chroma"
+    else:
+        if not os.getenv("CHROMA_TEST_URI"):
+            print("Skipping test, missing chroma server URI")
+            return
+        config.archival_storage_path = None
+        config.archival_storage_uri = os.environ["CHROMA_TEST_URI"]
+    conn = ChromaStorageConnector(TableType.ARCHIVAL_MEMORY, config, user_id=user_id, agent_id=uuid.uuid4())
+    conn.delete()
+
+    num_records = 2 * INSERT_BATCH_SIZE + 1
+    records = [
+        Passage(
+            user_id=user_id,
+            agent_id=conn.agent_id,
+            text=f"passage {i}",
+            embedding=np.random.rand(8).tolist(),
+            embedding_dim=8,
+            embedding_model="test",
+        )
+        for i in range(num_records)
+    ]
+    record_fields = copy.deepcopy([vars(record) for record in records])
+    conn.insert_many(records)
+    assert conn.size() == num_records, f"Expected {num_records} records, got {conn.size()}"
+    assert [vars(record) for record in records] == record_fields, "insert_many modified the records"
+
+    # every sub-batch (including the last, partial one) stores its own records
+    stored_texts = {record.id: record.text for record in conn.get_all(limit=num_records, include_embeddings=False)}
+    assert stored_texts == {record.id: record.text for record in records}, "insert_many lost or mixed up records across sub-batches"
+
+    # reads can skip fetching the embeddings
+    assert all(record.embedding is None for record in conn.get_all(limit=10, include_embeddings=False))
+    assert all(record.embedding is None for record in conn.iter_all(page_size=INSERT_BATCH_SIZE, include_embeddings=False))
+    results = conn.query(None, records[0].embedding, top_k=3, include_embeddings=False)
+    assert results[0].id == records[0].id and all(record.embedding is None for record in results)
+    assert all(record.embedding is not None for record in conn.get_all(limit=10))
+
+    # reads return the embeddings as inserted (up to chroma's float32 index precision, since these many records get flushed into it)
+    inserted_embeddings = {record.id: record.embedding for record in records}
+    assert all(np.allclose(record.embedding, inserted_embeddings[record.id], rtol=1e-6) for record in conn.get_all(limit=10))
+    assert np.allclose(conn.get(id=records[0].id).embedding, records[0].embedding, rtol=1e-6)
+
+    # concurrent HTTP inserts use one client per worker
+    if chroma_client == "http":
+        num_workers = min(INSERT_MAX_CONCURRENCY, 3)
+        assert len(conn.insert_collections) == num_workers, f"Expected {num_workers} worker clients, got {len(conn.insert_collections)}"
+        assert len({id(collection._client) for collection in conn.insert_collections + [conn.collection]}) == num_workers + 1
+
+    conn.delete()
+
+
+def test_chroma_embeddings_round_trip():
+    """Reading records back doesn't change their embeddings"""
+    from memgpt.agent_store.chroma import ChromaStorageConnector
+
+    config = copy.copy(TEST_MEMGPT_CONFIG)
+    config.archival_storage_type = "chroma"
+    config.archival_storage_path = "./test_chroma"
+    conn = ChromaStorageConnector(TableType.ARCHIVAL_MEMORY, config, user_id=user_id, agent_id=uuid.uuid4())
+    conn.delete()
+
+    records = [
+        Passage(
+            user_id=user_id,
+            agent_id=conn.agent_id,
+            text=f"passage {i}",
+            embedding=np.random.rand(8).tolist(),
+            embedding_dim=8,
+            embedding_model="test",
+        )
+        for i in range(20)
+    ]
+    conn.insert_many(records)
+    inserted_embeddings = {record.id: record.embedding for record in records}
+    assert all(record.embedding == inserted_embeddings[record.id] for record in conn.get_all(limit=len(records)))
+    assert conn.get(id=records[0].id).embedding == records[0].embedding
+
+    conn.delete()
+
+
+@pytest.mark.parametrize(
+    "uri,expected",
+    [
+        ("localhost:8000", ("localhost", 8000, False)),
+        ("http://localhost:9000", ("localhost", 9000, False)),
+        ("https://chroma.example.com", ("chroma.example.com", 443, True)),
+        ("[::1]:8001", ("[::1]", 8001, False)),
+    ],
+)
+def test_chroma_parse_uri(uri, expected):
+    from memgpt.agent_store.chroma import parse_chroma_uri
+
+    assert parse_chroma_uri(uri) == expected, f"Expected {expected}, got {parse_chroma_uri(uri)}"